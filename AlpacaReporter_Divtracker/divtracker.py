@@ -1,20 +1,36 @@
 import sys
 import os
-import json
+import bisect
+import csv
+import time
 import traceback
+from contextlib import contextmanager
+from enum import IntEnum
 from datetime import datetime, timedelta
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 
+import numpy as np
+import orjson
+from fastnumbers import fast_float
+from numba import njit
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PyQt5 import QtWidgets
 from PyQt5.QtWidgets import (
-    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
-    QTableWidgetItem, QPushButton, QLabel, QLineEdit, QHeaderView,
+    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableView,
+    QPushButton, QLabel, QDoubleSpinBox, QHeaderView,
     QMessageBox, QFileDialog, QComboBox, QInputDialog, QDialog,
-    QCheckBox, QScrollArea
+    QCheckBox, QScrollArea, QStyledItemDelegate, QStyleOptionButton,
+    QStyle, QApplication
+)
+from PyQt5.QtCore import (
+    Qt, QAbstractTableModel, QModelIndex, QTimer, QSignalBlocker, QEvent, pyqtSignal,
+    QObject, QRunnable, QThreadPool
 )
-from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QColor, QFont
 from reportlab.platypus import (
     SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -25,104 +41,264 @@ from reportlab.lib.units import inch, cm
 from reportlab.lib import colors
 
 STATE_FILE = "divtracker_state.json"
+LAST_ETF_FILE = "last_etf.txt"
 ALPACA_CONFIG = "alpaca_config.json"
 SYNC_STATE_FILE = "alpaca_sync_state.json"
+ACTIVITIES_CACHE_FILE = "alpaca_activities.jsonl"
+# Rewrite the append-only cache once lines exceed unique activities by this factor
+ACTIVITIES_COMPACT_RATIO = 1.25
 IGNORED_TRADES_FILE = "ignored_trades.json"
-TRADES_CACHE_FILE = "trades_cache.json"
+TRADES_CACHE_DIR = "trades_cache"
+LEGACY_TRADES_CACHE_FILE = "trades_cache.json"
+TRADE_COLUMNS = ["cw", "order_id", "qty", "price"]
+TRADE_DTYPES = {"cw": str, "order_id": str, "qty": float, "price": float}
+WEEK_FIELDS = [
+    "div_gross", "div_tax", "buy_total_cost", "buy_total_qty",
+    "sell_total_cost", "sell_total_qty"
+]
+# Week field each dividend-type activity is summed into
+DIVIDEND_FIELDS = {"DIV": "div_gross", "DIVNRA": "div_tax"}
+ACTIVITY_FIELDS = [
+    "id", "activity_type", "symbol", "date", "transaction_time",
+    "type", "side", "qty", "price", "net_amount", "amount"
+]
+
+ACTIVITY_TYPES = [
+    ("FILL", "trades"),
+    ("DIV", "dividends"),
+    ("DIVNRA", "withholding taxes"),
+]
+
+ALPACA_LIVE_URL = "https://api.alpaca.markets"
+ALPACA_PAPER_URL = "https://paper-api.alpaca.markets"
+PAGE_SIZE = 100
+ACTIVITY_WINDOW_WORKERS = 4
 
 COLUMNS = [
     "CW", "Start", "Div/W", "Gross", "WHT", "Net", "DRIP", "Total",
     "Price", "Value", "Ø/Week", "Year", "Return", "Edit"
 ]
-EDITABLE_COLS = [0, 2]
-CALCULATED_COLS = [1, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
+
+class Col(IntEnum):
+    CW = 0
+    START = 1
+    DIV_W = 2
+    GROSS = 3
+    WHT = 4
+    NET = 5
+    DRIP = 6
+    TOTAL = 7
+    PRICE = 8
+    VALUE = 9
+    AVG_WEEK = 10
+    YEAR = 11
+    RETURN = 12
+    EDIT = 13
+
+EDITABLE_COLS = [Col.CW, Col.DIV_W]
+CALCULATED_COLS = [
+    Col.START, Col.GROSS, Col.WHT, Col.NET, Col.DRIP, Col.TOTAL,
+    Col.PRICE, Col.VALUE, Col.AVG_WEEK, Col.YEAR, Col.RETURN
+]
+NCOL = len(COLUMNS)
+LAST_COL = NCOL - 1
+DATA_COLUMNS = COLUMNS[:LAST_COL]  # everything but the Edit button column
+CALC_SET = frozenset(CALCULATED_COLS)
+EDITABLE_SET = frozenset(EDITABLE_COLS)
+CALC_BG = QColor(230, 240, 250)
+GAIN_FG = QColor(0, 128, 0)
+LOSS_FG = QColor(255, 0, 0)
+EDIT_FLAGS = Qt.ItemIsEnabled | Qt.ItemIsEditable | Qt.ItemIsSelectable
+CALC_FLAGS = Qt.ItemIsEnabled
+EDIT_BTN_TEXT = "Edit"
+# Raw float copies of formatted columns, stored alongside the row strings
+NUMERIC_KEYS = {"Value": "_value_num", "Return": "_return_num"}
+
+PDF_HEADER = list(DATA_COLUMNS)
+PDF_COL_WIDTHS = [1.2*cm, 1.5*cm, 2*cm, 1.7*cm, 1.2*cm, 1.5*cm, 1.3*cm, 1.7*cm,
+                  1.8*cm, 1.8*cm, 1.2*cm, 1.5*cm, 2*cm]
+PDF_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#8FBC8F")),
+    ("TEXTCOLOR", (0,0), (-1,0), colors.whitesmoke),
+    ("ALIGN", (0,0), (-1,-1), "CENTER"),
+    ("FONTNAME", (0,0), (-1,0), "Helvetica-Bold"),
+    ("FONTSIZE", (0,0), (-1,-1), 8),
+    ("GRID", (0,0), (-1,-1), 0.5, colors.black),
+    ("ROWBACKGROUNDS", (0,1), (-1,-1), [colors.white, colors.HexColor("#D6E4F5")])
+])
+
+def _jloads(raw):
+    return orjson.loads(raw)
+
+def _jload(path):
+    with open(path, "rb") as f:
+        return _jloads(f.read())
+
+def _jdumps(obj):
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+def _jwrite(path, raw):
+    with open(path, "wb") as f:
+        f.write(raw)
+
+def _jsave(path, obj):
+    _jwrite(path, _jdumps(obj))
 
 def load_all_states():
     if os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return _jload(STATE_FILE)
     return {}
 
-def save_all_states(states):
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(states, f, indent=2, ensure_ascii=False)
-
-def get_last_viewed_etf():
-    data = load_all_states()
+def save_all_states(states, last_hash=None):
+    """Write the states unless they serialize to the same hash as `last_hash`; returns the hash."""
+    raw = _jdumps(states)
+    digest = hash(raw)
+    if digest != last_hash:
+        _jwrite(STATE_FILE, raw)
+    return digest
+
+def get_last_viewed_etf(states_raw=None):
+    if os.path.exists(LAST_ETF_FILE):
+        with open(LAST_ETF_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    # Older versions kept the pointer inside the state file
+    data = states_raw if states_raw is not None else load_all_states()
     return data.get("_last_viewed_etf")
 
 def save_last_viewed_etf(etf_name):
-    data = load_all_states()
-    data["_last_viewed_etf"] = etf_name
-    save_all_states(data)
+    with open(LAST_ETF_FILE, "w", encoding="utf-8") as f:
+        f.write(etf_name)
 
 def load_alpaca_config():
     if os.path.exists(ALPACA_CONFIG):
-        with open(ALPACA_CONFIG, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return _jload(ALPACA_CONFIG)
     return {}
 
 def save_alpaca_config(cfg):
-    with open(ALPACA_CONFIG, "w", encoding="utf-8") as f:
-        json.dump(cfg, f, indent=2, ensure_ascii=False)
+    _jsave(ALPACA_CONFIG, cfg)
 
 def load_sync_state():
     if os.path.exists(SYNC_STATE_FILE):
-        with open(SYNC_STATE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return _jload(SYNC_STATE_FILE)
     return {}
 
 def save_sync_state(state):
-    with open(SYNC_STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+    _jsave(SYNC_STATE_FILE, state)
+
+def _jline(obj):
+    return orjson.dumps(obj) + b"\n"
+
+def load_activities_cache():
+    """Cached activities from the append-only JSONL file (one activity per line)."""
+    if not os.path.exists(ACTIVITIES_CACHE_FILE):
+        return []
+    with open(ACTIVITIES_CACHE_FILE, "rb") as f:
+        lines = [line for line in f if line.strip()]
+    acts, seen = [], set()
+    for line in lines:
+        a = _jloads(line)
+        if a.get("id") not in seen:
+            seen.add(a.get("id"))
+            acts.append(a)
+    if len(lines) > len(acts) * ACTIVITIES_COMPACT_RATIO:
+        save_activities_cache(acts)
+    return acts
+
+def save_activities_cache(acts, new=None):
+    """Append `new` (the tail of `acts`) to the cache; rewrite the whole file if
+    new is None or the JSONL file does not exist yet."""
+    if new is not None and os.path.exists(ACTIVITIES_CACHE_FILE):
+        with open(ACTIVITIES_CACHE_FILE, "ab") as f:
+            f.write(b"".join(_jline(a) for a in new))
+    else:
+        _jwrite(ACTIVITIES_CACHE_FILE, b"".join(_jline(a) for a in acts))
 
 def load_ignored_trades():
     if os.path.exists(IGNORED_TRADES_FILE):
-        with open(IGNORED_TRADES_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return _jload(IGNORED_TRADES_FILE)
     return {}
 
 def save_ignored_trades(ignored):
-    with open(IGNORED_TRADES_FILE, "w", encoding="utf-8") as f:
-        json.dump(ignored, f, indent=2, ensure_ascii=False)
+    _jsave(IGNORED_TRADES_FILE, ignored)
+
+def trades_frame(df):
+    return df.reindex(columns=TRADE_COLUMNS).astype(TRADE_DTYPES).reset_index(drop=True)
+
+def _load_legacy_trades_cache(path):
+    flat = pd.DataFrame(
+        [dict(trade, sym=sym, cw=cw)
+         for sym, weeks in _jload(path).items()
+         for cw, trades in weeks.items()
+         for trade in trades],
+        columns=["sym"] + TRADE_COLUMNS
+    )
+    return {sym: trades_frame(frame) for sym, frame in flat.groupby("sym")}
 
 def load_trades_cache():
-    if os.path.exists(TRADES_CACHE_FILE):
-        with open(TRADES_CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+    """Buy trades per symbol, one Parquet partition per symbol: {sym: DataFrame}."""
+    if os.path.isdir(TRADES_CACHE_DIR):
+        return {
+            name[:-len(".parquet")]: trades_frame(pd.read_parquet(os.path.join(TRADES_CACHE_DIR, name)))
+            for name in os.listdir(TRADES_CACHE_DIR) if name.endswith(".parquet")
+        }
+    if os.path.exists(LEGACY_TRADES_CACHE_FILE):
+        # Migrate every symbol at once: as soon as the directory exists it replaces the
+        # legacy file, so partitions written only for changed symbols would drop the rest.
+        cache = _load_legacy_trades_cache(LEGACY_TRADES_CACHE_FILE)
+        save_trades_cache(cache)
+        return cache
     return {}
 
-def save_trades_cache(cache):
-    with open(TRADES_CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
-
-def get_alpaca_positions(key, secret, use_paper=True):
-    base = "https://paper-api.alpaca.markets" if use_paper else "https://api.alpaca.markets"
-    url = f"{base}/v2/positions"
-    headers = {
+def save_trades_cache(cache, symbols=None):
+    """Write the partitions of the given symbols (all if None); other partitions are not touched."""
+    symbols = list(cache if symbols is None else symbols)
+    if not symbols:
+        return
+    os.makedirs(TRADES_CACHE_DIR, exist_ok=True)
+    for sym in symbols:
+        cache[sym].to_parquet(os.path.join(TRADES_CACHE_DIR, f"{sym}.parquet"),
+                              index=False, compression="zstd")
+
+# Bound once; formats a float as "$1,234.56"
+_fmt_money = "${:,.2f}".format
+_MONEY_TRANS = str.maketrans("", "", "$,")
+
+def _parse_money(s):
+    """Parse a formatted amount like "$1,234.56"; unparsable text yields 0.0."""
+    return fast_float(s.translate(_MONEY_TRANS), default=0.0)
+
+@lru_cache(maxsize=4)
+def _alpaca_session(key, secret):
+    """Keep-alive session per API key, so pages and endpoints share pooled TLS connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+    )
+    session.mount(ALPACA_LIVE_URL, adapter)
+    session.mount(ALPACA_PAPER_URL, adapter)
+    session.headers.update({
         "APCA-API-KEY-ID": key,
         "APCA-API-SECRET-KEY": secret,
         "accept": "application/json"
-    }
-    r = requests.get(url, headers=headers, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    })
+    return session
 
-def get_activities_by_type(key, secret, activity_type, use_paper=True, after=None, until=None):
-    base = "https://paper-api.alpaca.markets" if use_paper else "https://api.alpaca.markets"
-    endpoint = f"{base}/v2/account/activities/{activity_type}"
-    headers = {
-        "APCA-API-KEY-ID": key,
-        "APCA-API-SECRET-KEY": secret,
-        "accept": "application/json"
-    }
+def get_alpaca_positions(key, secret, use_paper=True):
+    base = ALPACA_PAPER_URL if use_paper else ALPACA_LIVE_URL
+    url = f"{base}/v2/positions"
+    r = _alpaca_session(key, secret).get(url, timeout=30)
+    r.raise_for_status()
+    return _jloads(r.content)
 
+def _fetch_activity_pages(session, endpoint, label, after=None, until=None, max_pages=None):
     all_activities = []
     page_count = 0
     
     params = {
         "direction": "asc",
-        "page_size": "100"
+        "page_size": str(PAGE_SIZE)
     }
     
     if after:
@@ -130,59 +306,130 @@ def get_activities_by_type(key, secret, activity_type, use_paper=True, after=Non
     if until:
         params["until"] = until
     
-    while True:
+    while max_pages is None or page_count < max_pages:
         page_count += 1
-        print(f"  [{activity_type}] Page {page_count}...")
+        print(f"  [{label}] Page {page_count}...")
         
+        # Errors propagate: a missing page would leave a silent hole in the history
         try:
-            r = requests.get(endpoint, headers=headers, params=params, timeout=30)
+            r = session.get(endpoint, params=params, timeout=30)
             r.raise_for_status()
-            data = r.json()
-            
-            if not data or len(data) == 0:
-                print(f"  [{activity_type}] -> No further data")
-                break
-            
-            all_activities.extend(data)
-            print(f"  [{activity_type}] -> {len(data)} entries ({len(all_activities)} total)")
-            
-            if len(data) < 100:
-                print(f"  [{activity_type}] -> Reached last page")
-                break
-            
-            last_date = data[-1].get("date") or data[-1].get("transaction_time")
-            if last_date:
-                params["after"] = last_date[:10]
-            else:
-                break
-                
         except requests.exceptions.RequestException as e:
-            print(f"  [{activity_type}] -> Error: {e}")
+            print(f"  [{label}] -> Error: {e}")
+            raise
+        data = _jloads(r.content)
+        
+        if not data or len(data) == 0:
+            print(f"  [{label}] -> No further data")
+            break
+        
+        all_activities.extend(data)
+        print(f"  [{label}] -> {len(data)} entries ({len(all_activities)} total)")
+        
+        if len(data) < PAGE_SIZE:
+            print(f"  [{label}] -> Reached last page")
+            break
+        
+        last_date = data[-1].get("date") or data[-1].get("transaction_time")
+        if last_date:
+            params["after"] = last_date[:10]
+        else:
             break
     
     return all_activities
 
-def get_all_activities_complete(key, secret, use_paper=True, after=None, until=None):
+def _month_windows(start, end):
+    windows = []
+    lo = start
+    while lo < end:
+        hi = min((lo.replace(day=1) + timedelta(days=32)).replace(day=1), end)
+        windows.append((lo, hi))
+        lo = hi
+    return windows
+
+def get_activities_by_type(key, secret, activity_type, use_paper=True, after=None, until=None):
+    base = ALPACA_PAPER_URL if use_paper else ALPACA_LIVE_URL
+    endpoint = f"{base}/v2/account/activities/{activity_type}"
+    session = _alpaca_session(key, secret)
+
+    first_page = _fetch_activity_pages(session, endpoint, activity_type, after, until, max_pages=1)
+    if len(first_page) < PAGE_SIZE or not activity_date(first_page[-1]):
+        return first_page
+
+    # More than one page: the first page tells where the history starts, so the rest
+    # is split into monthly windows that are paged through concurrently.
+    start = datetime.fromisoformat(activity_date(first_page[-1])).date()
+    end = datetime.fromisoformat(until).date() if until else datetime.today().date() + timedelta(days=1)
+    windows = _month_windows(start, end)
+    print(f"  [{activity_type}] -> Fetching {len(windows)} monthly windows from {start}")
+
+    def fetch_window(window):
+        lo, hi = window
+        # Windows overlap by a day on both sides; duplicates are dropped by id below.
+        return _fetch_activity_pages(
+            session, endpoint, f"{activity_type} {lo:%Y-%m}",
+            after=(lo - timedelta(days=1)).isoformat(),
+            until=(hi + timedelta(days=1)).isoformat()
+        )
+
+    # pool.map re-raises the first failed window, so partial history is never returned
+    all_activities = {}
+    with ThreadPoolExecutor(max_workers=ACTIVITY_WINDOW_WORKERS) as pool:
+        for page in [first_page, *pool.map(fetch_window, windows)]:
+            for a in page:
+                all_activities.setdefault(a.get("id") or id(a), a)
+    return list(all_activities.values())
+
+def activity_date(a):
+    return a.get("date") or a.get("transaction_time", "")[:10]
+
+@lru_cache(maxsize=4096)
+def week_of_date(dstr):
+    """ISO (year, week) of a YYYY-MM-DD string; sorts chronologically as a tuple."""
+    y, w, _ = datetime.fromisoformat(dstr).isocalendar()
+    return y, w
+
+def cw_label(week):
+    y, w = week
+    return f"{w:02d}/{y}"
+
+def activity_cursors(acts):
+    """Latest activity date per activity type; written only after a complete fetch."""
+    cursors = {}
+    for a in acts:
+        typ, day = a.get("activity_type"), activity_date(a)
+        if typ and day and day > cursors.get(typ, ""):
+            cursors[typ] = day
+    return cursors
+
+def merge_activities(cached, fetched):
+    """Append fetched activities to the cached ones, skipping ids already known."""
+    known = {a.get("id") for a in cached}
+    return cached + [a for a in fetched if a.get("id") not in known]
+
+def get_all_activities_complete(key, secret, use_paper=True, after_by_type=None, until=None):
+    """All activities of ACTIVITY_TYPES; `after_by_type` gives each type its own start date."""
+    after_by_type = after_by_type or {}
     print("\n" + "="*60)
     print("STARTING COMPLETE ACTIVITY FETCH")
     print("="*60)
     
-    all_activities = []
-    
-    print("\n1. Loading Trades (FILL)...")
-    fills = get_activities_by_type(key, secret, "FILL", use_paper, after, until)
-    all_activities.extend(fills)
-    print(f"✓ {len(fills)} trades loaded")
-    
-    print("\n2. Loading Dividends (DIV)...")
-    divs = get_activities_by_type(key, secret, "DIV", use_paper, after, until)
-    all_activities.extend(divs)
-    print(f"✓ {len(divs)} dividends loaded")
+    print(f"\nLoading {', '.join(typ for typ, _ in ACTIVITY_TYPES)} in parallel...")
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(ACTIVITY_TYPES)) as pool:
+        futures = {
+            pool.submit(get_activities_by_type, key, secret, typ, use_paper,
+                        after_by_type.get(typ), until): (typ, label)
+            for typ, label in ACTIVITY_TYPES
+        }
+        for future in as_completed(futures):
+            typ, label = futures[future]
+            results[typ] = future.result()
+            print(f"✓ {len(results[typ])} {label} loaded ({typ})")
     
-    print("\n3. Loading Withholding Taxes (DIVNRA)...")
-    divnra = get_activities_by_type(key, secret, "DIVNRA", use_paper, after, until)
-    all_activities.extend(divnra)
-    print(f"✓ {len(divnra)} withholding taxes loaded")
+    all_activities = []
+    for typ, _ in ACTIVITY_TYPES:
+        all_activities.extend(results[typ])
     
     print(f"\n{'='*60}")
     print(f"TOTAL: {len(all_activities)} activities")
@@ -190,6 +437,121 @@ def get_all_activities_complete(key, secret, use_paper=True, after=None, until=N
     
     return all_activities
 
+@njit(cache=True)
+def _position_ledger(net, buy_cost, buy_qty, sell_cost, sell_qty, current_price):
+    """Sequential share and investment accounting; each week depends on the last."""
+    n = len(net)
+    start = np.zeros(n, dtype=np.int64)
+    drip = np.zeros(n, dtype=np.int64)
+    total = np.zeros(n, dtype=np.int64)
+    price = np.full(n, np.nan)
+    invested = np.zeros(n)
+
+    shares = 0
+    total_invested = 0.0
+    for i in range(n):
+        start[i] = shares
+        if buy_qty[i] > 0:
+            shares += int(buy_qty[i])
+            avg_buy_price = buy_cost[i] / buy_qty[i]
+            price[i] = avg_buy_price
+            if net[i] >= buy_cost[i]:
+                if avg_buy_price > 0:
+                    drip[i] = int(net[i] / avg_buy_price)
+            else:
+                total_invested += buy_cost[i] - net[i]
+        elif current_price > 0:
+            price[i] = current_price
+
+        if sell_qty[i] > 0:
+            total_invested -= sell_cost[i]
+            shares = 0
+
+        total[i] = shares
+        invested[i] = total_invested
+
+    return start, drip, total, price, invested
+
+def compute_rows(gross, tax, buy_cost, buy_qty, sell_cost, sell_qty, current_price):
+    """Per-week figures for one symbol.
+
+    Takes float arrays aligned with the symbol's sorted weeks and returns arrays
+    (start, drip, total, price, value, net, avg_week, year, ret, invested);
+    price is NaN for weeks without a buy when no current price is known.
+    Only the share ledger runs in the compiled loop; running dividend totals are
+    plain cumulative sums.
+    """
+    net = gross - np.abs(tax)
+    start, drip, total, price, invested = _position_ledger(
+        net, buy_cost, buy_qty, sell_cost, sell_qty, current_price)
+    value = total * current_price if current_price > 0 else np.zeros(len(net))
+    cumulative_div = np.cumsum(net)
+    avg_week = cumulative_div / np.arange(1, len(net) + 1)
+    return (start, drip, total, price, value, net, avg_week, avg_week * 52,
+            cumulative_div - invested, invested)
+
+def activities_frame(acts):
+    return pd.DataFrame(acts).reindex(columns=ACTIVITY_FIELDS).astype(object)
+
+def group_activities(df, symbols, ignored_trades):
+    """Sum dividends, taxes, buys and sells per symbol and calendar week.
+
+    Takes the activities_frame of all activities.
+    Returns ({sym: {(year, week): {field: total}}}, {sym: DataFrame of the counted buy trades}).
+    """
+    df = df[df["symbol"].isin(list(symbols))]
+    dates = df["date"].replace("", np.nan).fillna(df["transaction_time"].str[:10])
+    df = df[dates.fillna("") != ""]
+    dates = dates[df.index]
+    weeks = {d: week_of_date(d) for d in dates.unique()}
+    df = df.assign(
+        year=dates.map({d: y for d, (y, _) in weeks.items()}),
+        week=dates.map({d: w for d, (_, w) in weeks.items()}),
+        cw=dates.map({d: cw_label(yw) for d, yw in weeks.items()}).astype(str)
+    )
+    keys = ["symbol", "year", "week"]
+
+    fills = df[(df["activity_type"] == "FILL")
+               & df["type"].fillna("").str.lower().str.strip().isin(["fill", "partial_fill"])]
+    fills = fills.assign(order_id=fills["id"].fillna(fills["symbol"].astype(str) + "_" + fills["cw"]))
+    duplicated = fills["order_id"].duplicated()
+    for order_id in fills.loc[duplicated, "order_id"]:
+        print(f"  [DUPLICATE] {order_id} - skipped")
+    fills = fills[~duplicated]
+    ignored = fills["order_id"].isin([oid for oid, flag in ignored_trades.items() if flag])
+    for order_id in fills.loc[ignored, "order_id"]:
+        print(f"  [IGNORED] {order_id}")
+    fills = fills[~ignored]
+    fills = fills.assign(qty=pd.to_numeric(fills["qty"]).astype(float).fillna(0.0),
+                         price=pd.to_numeric(fills["price"]).astype(float).fillna(0.0))
+    fills = fills[fills["qty"] > 0]
+    fills = fills.assign(cost=fills["qty"] * fills["price"])
+    buys = fills[fills["side"] == "buy"]
+    sells = fills[fills["side"] == "sell"]
+
+    dividends = df[df["activity_type"].isin(list(DIVIDEND_FIELDS))]
+    dividends = dividends.assign(
+        field=dividends["activity_type"].map(DIVIDEND_FIELDS),
+        amount=pd.to_numeric(dividends["net_amount"].fillna(dividends["amount"])).astype(float).fillna(0.0)
+    )
+    dividend_totals = dividends.groupby(keys + ["field"])["amount"].sum()
+
+    totals = pd.concat({
+        **{field: dividend_totals.xs(field, level="field")
+           for field in dividend_totals.index.unique("field")},
+        "buy_total_cost": buys.groupby(keys)["cost"].sum(),
+        "buy_total_qty": buys.groupby(keys)["qty"].sum(),
+        "sell_total_cost": sells.groupby(keys)["cost"].sum(),
+        "sell_total_qty": sells.groupby(keys)["qty"].sum(),
+    }, axis=1).reindex(columns=WEEK_FIELDS).fillna(0.0)
+
+    grouped = defaultdict(dict)
+    for (sym, y, w), vals in totals.to_dict("index").items():
+        grouped[sym][(int(y), int(w))] = vals
+
+    trades = {sym: trades_frame(frame) for sym, frame in buys.groupby("symbol")}
+    return grouped, trades
+
 class TradeEditorDialog(QDialog):
     def __init__(self, parent, sym, cw, trades_list):
         super().__init__(parent)
@@ -252,6 +614,355 @@ class TradeEditorDialog(QDialog):
         save_ignored_trades(self.ignored_trades)
         super().accept()
 
+class DivTableModel(QAbstractTableModel):
+    """Table model storing rows column-wise.
+
+    Stored text lives in one list per column of DATA_COLUMNS; recalculated
+    columns are float arrays in `_derived` and formatted on demand. Rows go in
+    and out as dicts keyed by COLUMNS, matching the saved state.
+    """
+
+    def __init__(self, rows=None, parent=None):
+        super().__init__(parent)
+        self._read_only = False
+        self._load(rows or [])
+
+    def _load(self, rows):
+        self._n = len(rows)
+        self._cols = {name: [str(row.get(name, "")) for row in rows] for name in DATA_COLUMNS}
+        self._nums = {key: [row.get(key) for row in rows] for key in NUMERIC_KEYS.values()}
+        self._inputs = None
+        self._derived = {}
+
+    def set_read_only(self, read_only):
+        self._read_only = read_only
+
+    def column(self, name):
+        return self._cols[name]
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self._load(rows)
+        self.endResetModel()
+
+    def append_row(self, row=None):
+        row = row or {}
+        r = self._n
+        self.beginInsertRows(QModelIndex(), r, r)
+        for name, values in self._cols.items():
+            values.append(str(row.get(name, "")))
+        for key, values in self._nums.items():
+            values.append(row.get(key))
+        self._n += 1
+        self._inputs = None
+        self.endInsertRows()
+
+    def numeric_inputs(self):
+        """Price, net dividend, total shares and the running net dividend total per row
+        as float arrays, parsed and summed once per row set."""
+        if self._inputs is None:
+            price, net, total = (
+                np.array([_parse_money(v) for v in self._cols[name]], dtype=float)
+                for name in ("Price", "Net", "Total")
+            )
+            self._inputs = (price, net, total, np.cumsum(net))
+        return self._inputs
+
+    def set_derived(self, derived):
+        self._derived = derived
+        self.columns_changed(Col.DRIP, Col.RETURN)
+
+    def display_value(self, r, name):
+        values = self._derived.get(name)
+        if values is not None and r < len(values):
+            if name == "DRIP":
+                return str(int(values[r]))
+            return _fmt_money(values[r])
+        return self._cols[name][r]
+
+    def records(self):
+        """Snapshot of all rows as plain dicts; derived columns are formatted column-wise."""
+        derived = {name: values.tolist() for name, values in self._derived.items()}
+        cols = []
+        for name in DATA_COLUMNS:
+            values = derived.get(name)
+            if values is None:
+                cols.append(self._cols[name])
+                continue
+            text = [str(int(v)) for v in values] if name == "DRIP" else list(map(_fmt_money, values))
+            cols.append(text + self._cols[name][len(text):])
+        records = [dict(zip(DATA_COLUMNS, values)) for values in zip(*cols)]
+        for name, key in NUMERIC_KEYS.items():
+            values = derived.get(name, [])
+            nums = values + self._nums[key][len(values):]
+            for rec, v in zip(records, nums):
+                if v is not None:
+                    rec[key] = v
+        return records
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._n
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else NCOL
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return str(section + 1)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        r, c = index.row(), index.column()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if c == LAST_COL:
+                return EDIT_BTN_TEXT
+            return self.display_value(r, COLUMNS[c])
+        if role == Qt.BackgroundRole and c in CALC_SET:
+            return CALC_BG
+        if role == Qt.ForegroundRole and c == Col.RETURN:
+            returns = self._derived.get("Return")
+            if returns is not None and r < len(returns):
+                return GAIN_FG if returns[r] >= 0 else LOSS_FG
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if self._read_only or index.column() not in EDITABLE_SET:
+            return CALC_FLAGS
+        return EDIT_FLAGS
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if (role != Qt.EditRole or self._read_only or not index.isValid()
+                or index.column() not in EDITABLE_SET):
+            return False
+        self._cols[COLUMNS[index.column()]][index.row()] = str(value)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def columns_changed(self, first, last):
+        if self._n:
+            self.dataChanged.emit(self.index(0, first), self.index(self._n - 1, last))
+
+class EditButtonDelegate(QStyledItemDelegate):
+    """Paints an "Edit" push button and reports clicks without creating a widget per row."""
+
+    edit_clicked = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        btn = QStyleOptionButton()
+        btn.rect = option.rect.adjusted(2, 2, -2, -2)
+        btn.text = EDIT_BTN_TEXT
+        btn.state = QStyle.State_Enabled | QStyle.State_Raised
+        QApplication.style().drawControl(QStyle.CE_PushButton, btn, painter)
+
+    def createEditor(self, parent, option, index):
+        return None
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton
+                and option.rect.contains(event.pos())):
+            self.edit_clicked.emit(index.row())
+            return True
+        return False
+
+class SyncSignals(QObject):
+    """Signals of a SyncWorker; a QRunnable cannot emit on its own."""
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str, str)  # message, traceback
+
+class SyncWorker(QRunnable):
+    """Fetches Alpaca activities and rebuilds every tracker off the GUI thread.
+
+    Works on copies of the states and trades cache and persists the activity and
+    trades caches itself; the window applies the result dict from `finished`.
+    """
+
+    def __init__(self, cfg, states, trades_cache):
+        super().__init__()
+        self.signals = SyncSignals()
+        self.key, self.secret = cfg.get("key"), cfg.get("secret")
+        mode = cfg.get("mode", "live")
+        self.use_paper = mode == "paper"
+        self.account = f"{mode}:{self.key}"
+        self.states = {sym: dict(st) for sym, st in states.items()}
+        self.trades_cache = dict(trades_cache)
+
+    def run(self):
+        # An exception escaping a QRunnable aborts the process under PyQt5, so the
+        # outer handler still reports anything the stages did not anticipate.
+        try:
+            try:
+                acts, cached_acts = self._fetch_activities()
+            except (requests.RequestException, OSError, ValueError):
+                return self._fail("Could not load the account activities from Alpaca.")
+            try:
+                positions = get_alpaca_positions(self.key, self.secret, self.use_paper)
+            except (requests.RequestException, ValueError):
+                return self._fail("Could not load the open positions from Alpaca.")
+            print(f"✓ {len(positions)} positions fetched\n")
+            try:
+                changed_trades = self._compute_rows(acts, positions)
+            except (KeyError, ValueError, TypeError):
+                return self._fail("Could not process the Alpaca activities.")
+            try:
+                self._persist(acts, cached_acts, changed_trades)
+            except OSError:
+                return self._fail("Could not write the local caches.")
+        except Exception:
+            return self._fail("Unexpected error during sync.")
+        self.signals.finished.emit({
+            "states": self.states,
+            "trades_cache": self.trades_cache,
+            "new": len(acts) - len(cached_acts),
+            "total": len(acts),
+        })
+
+    def _fail(self, message):
+        """Report the exception being handled; the traceback only goes to the details pane."""
+        self.signals.failed.emit(f"{message}\n\n{sys.exc_info()[1]}", traceback.format_exc())
+
+    def _fetch_activities(self):
+        """Cached plus newly fetched activities, and the cached ones alone.
+
+        Any failed page or window raises, so a partial history never gets here.
+        """
+        until = (datetime.today() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+        # Posted activities never change: per activity type, only fetch what came after
+        # that type's cursor (one day of overlap, deduplicated by id) and merge it into
+        # the local cache. Types without a cursor are fetched in full.
+        sync_state = load_sync_state()
+        cached_acts = []
+        after_by_type = {}
+        if sync_state.get("account") == self.account and sync_state.get("cursors"):
+            cached_acts = load_activities_cache()
+            if cached_acts:
+                after_by_type = {
+                    typ: (datetime.fromisoformat(last) - timedelta(days=1)).strftime("%Y-%m-%d")
+                    for typ, last in sync_state["cursors"].items()
+                }
+
+        new_acts = get_all_activities_complete(self.key, self.secret, self.use_paper,
+                                               after_by_type=after_by_type, until=until)
+        acts = merge_activities(cached_acts, new_acts)
+        print(f"✓ {len(acts) - len(cached_acts)} new activities, {len(acts)} total\n")
+        return acts, cached_acts
+
+    def _compute_rows(self, acts, positions):
+        """Rebuild the rows of every symbol with dividends; returns the symbols whose
+        trades changed."""
+        current_week = week_of_date(datetime.today().strftime("%Y-%m-%d"))
+
+        acts_df = activities_frame(acts)
+        symbols_with_divs = set(acts_df.loc[
+            acts_df["activity_type"].isin(list(DIVIDEND_FIELDS)) & (acts_df["symbol"].fillna("") != ""),
+            "symbol"
+        ].unique())
+        
+        print(f"✓ {len(symbols_with_divs)} symbols with dividends found\n")
+
+        for sym in list(self.states.keys()):
+            if sym not in symbols_with_divs:
+                print(f"⊗ {sym}: No dividends -> will be removed")
+                self.states.pop(sym, None)
+
+        for sym in symbols_with_divs:
+            if sym not in self.states:
+                self.states[sym] = {"invest": 0.00, "rows": []}
+
+        ignored_trades = load_ignored_trades()
+        pos_price = {p["symbol"]: float(p["current_price"]) for p in positions}
+        grouped, synced_trades = group_activities(acts_df, self.states, ignored_trades)
+
+        for n, (sym, weeks) in enumerate(grouped.items(), 1):
+            self.signals.progress.emit(n, len(grouped))
+            print(f"\n{'='*60}")
+            print(f"Processing {sym}: {len(weeks)} weeks")
+            print(f"{ '='*60}\n")
+            
+            rows = []
+            current_price = pos_price.get(sym, 0.0)
+            
+            if current_week not in weeks:
+                weeks[current_week] = dict.fromkeys(WEEK_FIELDS, 0.0)
+            
+            sorted_weeks = sorted(weeks)
+            
+            # Load existing rows for Div/W protection
+            existing_rows = {r["CW"]: r for r in self.states.get(sym, {}).get("rows", [])}
+            
+            print(f"Weeks: {', '.join(map(cw_label, sorted_weeks))}")
+            print(f"Current week: {cw_label(current_week)}\n")
+            
+            fields = np.array([[weeks[w][f] for f in WEEK_FIELDS] for w in sorted_weeks], dtype=float)
+            gross, tax = fields[:, 0], fields[:, 1]
+            (start, drip, total, price, value, net, avg_week,
+             yearly, rendite, invested) = compute_rows(*np.ascontiguousarray(fields.T), current_price)
+            
+            for i, week in enumerate(sorted_weeks):
+                cw = cw_label(week)
+                
+                # Div/W PROTECTION: keep manually set values
+                div_w = existing_rows.get(cw, {}).get("Div/W", "").strip()
+                if div_w:
+                    div_w = existing_rows[cw]["Div/W"]
+                elif start[i] > 0:
+                    div_w = f"{gross[i] / start[i]:.4f}"
+                
+                rows.append({
+                    "CW": cw,
+                    "Start": str(start[i]),
+                    "Div/W": div_w,
+                    "Gross": _fmt_money(gross[i]),
+                    "WHT": _fmt_money(abs(tax[i])),
+                    "Net": _fmt_money(net[i]),
+                    "DRIP": str(drip[i]),
+                    "Total": str(total[i]),
+                    "Price": "" if np.isnan(price[i]) else f"{price[i]:.2f}",
+                    "Value": _fmt_money(value[i]),
+                    "Ø/Week": _fmt_money(avg_week[i]),
+                    "Year": _fmt_money(yearly[i]),
+                    "Return": _fmt_money(rendite[i]),
+                    "Edit": EDIT_BTN_TEXT,
+                    "_value_num": float(value[i]),
+                    "_return_num": float(rendite[i]),
+                })
+            
+            total_invested = invested[-1]
+            print(f"\n✓ {len(rows)} rows, ${total_invested:.2f}, {total[-1]} Shares\n")
+            
+            self.states[sym]["invest"] = round(float(total_invested), 2)
+            self.states[sym]["rows"] = rows
+
+        changed_trades = []
+        for sym in grouped:
+            trades = synced_trades.get(sym, trades_frame(pd.DataFrame()))
+            cached = self.trades_cache.get(sym)
+            if cached is None or not cached.equals(trades):
+                self.trades_cache[sym] = trades
+                changed_trades.append(sym)
+        print(f"✓ Trades cache: {len(changed_trades)} of {len(grouped)} symbols changed\n")
+
+        return changed_trades
+
+    def _persist(self, acts, cached_acts, changed_trades):
+        # Only reached after every fetch succeeded (page errors propagate), so the
+        # cursors never move past activities that were not actually loaded.
+        # Incremental syncs only append what merge_activities added after the cache
+        save_activities_cache(acts, acts[len(cached_acts):] if cached_acts else None)
+        save_sync_state({
+            "account": self.account,
+            "cursors": activity_cursors(acts),
+        })
+        save_trades_cache(self.trades_cache, changed_trades)
+
 class DivTracker(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -263,11 +974,31 @@ class DivTracker(QMainWindow):
         if not self.states:
             self.states = {"ULTY": {"invest": 0.00, "rows": []}}
 
-        last = get_last_viewed_etf()
+        last = get_last_viewed_etf(states_raw)
         self.current_etf = last if last in self.states else list(self.states.keys())[0]
 
-        self.block_signals = False
         self.trades_cache = load_trades_cache()
+        self._sync_worker = None
+        self._sync_again = False
+        self._close_after_sync = False
+
+        self._edit_timer = QTimer(self)
+        self._edit_timer.setSingleShot(True)
+        self._edit_timer.setInterval(150)
+        self._edit_timer.timeout.connect(self._flush_edits)
+        # Zero-interval timer: recalculate_all calls in one event-loop pass run once
+        self._recalc_timer = QTimer(self)
+        self._recalc_timer.setSingleShot(True)
+        self._recalc_timer.setInterval(0)
+        self._recalc_timer.timeout.connect(self._do_recalculate_all)
+        self._bulk_depth = 0
+        # States are written at most once per interval, and only if they changed
+        self._last_written_hash = hash(_jdumps(self.states))
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(500)
+        self._flush_timer.timeout.connect(self._flush_states)
+
         self._build_gui()
         self.refresh_from_state()
 
@@ -279,25 +1010,26 @@ class DivTracker(QMainWindow):
         header = QHBoxLayout()
         header.addWidget(QLabel("ETF Selection:"))
         
+        self._etf_names = sorted(self.states.keys())
         self.etf_selector = QComboBox()
-        self.etf_selector.addItems(sorted(self.states.keys()))
+        self.etf_selector.addItems(self._etf_names)
         self.etf_selector.setCurrentText(self.current_etf)
         self.etf_selector.setMinimumWidth(120)
         self.etf_selector.setSizeAdjustPolicy(QComboBox.AdjustToContents)
         self.etf_selector.currentTextChanged.connect(self.on_etf_changed)
         header.addWidget(self.etf_selector)
 
-        btn_add = QPushButton("+ Add ETF")
-        btn_add.clicked.connect(self.add_etf)
-        header.addWidget(btn_add)
+        self.btn_add = QPushButton("+ Add ETF")
+        self.btn_add.clicked.connect(self.add_etf)
+        header.addWidget(self.btn_add)
 
-        btn_del = QPushButton("Delete ETF")
-        btn_del.clicked.connect(self.remove_etf)
-        header.addWidget(btn_del)
+        self.btn_del = QPushButton("Delete ETF")
+        self.btn_del.clicked.connect(self.remove_etf)
+        header.addWidget(self.btn_del)
 
-        btn_sync = QPushButton("Alpaca Sync: Update All Trackers")
-        btn_sync.clicked.connect(self.alpaca_sync_all)
-        header.addWidget(btn_sync)
+        self.btn_sync = QPushButton("Alpaca Sync: Update All Trackers")
+        self.btn_sync.clicked.connect(self.alpaca_sync_all)
+        header.addWidget(self.btn_sync)
 
         btn_api = QPushButton("Alpaca API-Key")
         btn_api.clicked.connect(self.input_alpaca_api)
@@ -316,10 +1048,14 @@ class DivTracker(QMainWindow):
         inv_label.setStyleSheet("background:#8FBC8F;color:white;padding:10px;")
         header.addWidget(inv_label)
         
-        self.invest_input = QLineEdit("0.00")
+        self.invest_input = QDoubleSpinBox()
+        # Sync can report a negative net investment once sales exceed buys
+        self.invest_input.setRange(-1e12, 1e12)
+        self.invest_input.setDecimals(2)
+        self.invest_input.setButtonSymbols(QDoubleSpinBox.NoButtons)
         self.invest_input.setMaximumWidth(150)
         self.invest_input.setStyleSheet("padding:5px;font-size:12pt;")
-        self.invest_input.textChanged.connect(self.on_data_changed)
+        self.invest_input.valueChanged.connect(self.on_data_changed)
         header.addWidget(self.invest_input)
         
         usd_label = QLabel("USD")
@@ -329,10 +1065,10 @@ class DivTracker(QMainWindow):
         layout.addLayout(header)
 
         buttons = QHBoxLayout()
-        btn_week = QPushButton("+ Add Week")
-        btn_week.clicked.connect(self.add_week)
-        btn_week.setStyleSheet("background:#28a745;color:white;padding:10px;font-weight:bold;")
-        buttons.addWidget(btn_week)
+        self.btn_week = QPushButton("+ Add Week")
+        self.btn_week.clicked.connect(self.add_week)
+        self.btn_week.setStyleSheet("background:#28a745;color:white;padding:10px;font-weight:bold;")
+        buttons.addWidget(self.btn_week)
 
         btn_csv = QPushButton("📊 Export as CSV")
         btn_csv.clicked.connect(self.export_csv)
@@ -344,23 +1080,26 @@ class DivTracker(QMainWindow):
         btn_pdf.setStyleSheet("background:#007bff;color:white;padding:10px;font-weight:bold;")
         buttons.addWidget(btn_pdf)
 
-        btn_reset = QPushButton("🔄 Reset")
-        btn_reset.clicked.connect(self.reset)
-        btn_reset.setStyleSheet("background:#dc3545;color:white;padding:10px;font-weight:bold;")
-        buttons.addWidget(btn_reset)
+        self.btn_reset = QPushButton("🔄 Reset")
+        self.btn_reset.clicked.connect(self.reset)
+        self.btn_reset.setStyleSheet("background:#dc3545;color:white;padding:10px;font-weight:bold;")
+        buttons.addWidget(self.btn_reset)
         buttons.addStretch()
         layout.addLayout(buttons)
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(len(COLUMNS))
-        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.model = DivTableModel(parent=self)
+        self.model.dataChanged.connect(self.on_cell_changed)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        edit_delegate = EditButtonDelegate(self.table)
+        edit_delegate.edit_clicked.connect(self.open_trade_editor)
+        self.table.setItemDelegateForColumn(Col.EDIT, edit_delegate)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.setAlternatingRowColors(True)
         self.table.setStyleSheet(
-            "QTableWidget{gridline-color:#ccc;background:white;}"
+            "QTableView{gridline-color:#ccc;background:white;}"
             "QHeaderView::section{background:#8FBC8F;color:white;padding:10px;font-weight:bold;}"
         )
-        self.table.itemChanged.connect(self.on_cell_changed)
         layout.addWidget(self.table)
 
         self.status_label = QLabel("Status: Ready")
@@ -373,10 +1112,10 @@ class DivTracker(QMainWindow):
                 QMessageBox.warning(self, "Error", "This name already exists.")
                 return
             self.states[name] = {"invest": 0.00, "rows": []}
-            self.etf_selector.clear()
-            self.etf_selector.addItems(sorted(self.states.keys()))
-            self.etf_selector.setCurrentText(name)
-            save_all_states(self.states)
+            with QSignalBlocker(self.etf_selector):
+                idx = self._insert_etf_item(name)
+            self.etf_selector.setCurrentIndex(idx)
+            self._mark_dirty()
 
     def remove_etf(self):
         name = self.etf_selector.currentText()
@@ -385,133 +1124,107 @@ class DivTracker(QMainWindow):
             return
         if QMessageBox.question(self, "Delete", f"Really delete '{name}'?",
                                 QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
+            self._edit_timer.stop()
             self.states.pop(name, None)
-            self.etf_selector.clear()
-            self.etf_selector.addItems(sorted(self.states.keys()))
-            save_all_states(self.states)
+            with QSignalBlocker(self.etf_selector):
+                self._remove_etf_item(name)
+            self._mark_dirty()
             self.current_etf = self.etf_selector.currentText()
             self.refresh_from_state()
 
+    def _insert_etf_item(self, name):
+        """Insert an ETF into the sorted selector; callers block its signals."""
+        idx = bisect.bisect(self._etf_names, name)
+        self._etf_names.insert(idx, name)
+        self.etf_selector.insertItem(idx, name)
+        return idx
+
+    def _remove_etf_item(self, name):
+        idx = bisect.bisect_left(self._etf_names, name)
+        del self._etf_names[idx]
+        self.etf_selector.removeItem(idx)
+
     def on_etf_changed(self, etf):
         if not etf:
             return
+        if self._edit_timer.isActive():
+            self._flush_edits()
         self.current_etf = etf
-        save_last_viewed_etf(etf)
         self.refresh_from_state()
         self.status_label.setText(f"Status: ETF '{etf}' loaded")
 
     def refresh_from_state(self):
-        self.block_signals = True
+        # set_rows resets the model in one go, so only the invest field needs silencing
         st = self.states.get(self.current_etf, {"invest": 0.00, "rows": []})
-        self.invest_input.setText(f"{st.get('invest', 0.00):.2f}")
+        with QSignalBlocker(self.invest_input):
+            self.invest_input.setValue(st.get('invest', 0.00))
         rows = st.get("rows", [])
         if rows:
-            self.populate_table(rows)
+            self.model.set_rows(rows)
         else:
             self.create_empty_row()
-        self.block_signals = False
         self.recalculate_all()
 
     def create_empty_row(self):
-        self.table.setRowCount(1)
-        for c in range(len(COLUMNS)):
-            if c == len(COLUMNS) - 1:
-                btn = QPushButton("Edit")
-                btn.clicked.connect(lambda checked, r=0: self.open_trade_editor(r))
-                self.table.setCellWidget(0, c, btn)
-            else:
-                itm = QTableWidgetItem("")
-                if c in CALCULATED_COLS:
-                    itm.setFlags(Qt.ItemIsEnabled)
-                    itm.setBackground(QColor(230, 240, 250))
-                else:
-                    itm.setFlags(Qt.ItemIsEnabled | Qt.ItemIsEditable | Qt.ItemIsSelectable)
-                self.table.setItem(0, c, itm)
-
-    def populate_table(self, rows):
-        self.table.setRowCount(len(rows))
-        for r, data in enumerate(rows):
-            for c, name in enumerate(COLUMNS):
-                if c == len(COLUMNS) - 1:
-                    btn = QPushButton("Edit")
-                    btn.clicked.connect(lambda checked, row=r: self.open_trade_editor(row))
-                    self.table.setCellWidget(r, c, btn)
-                else:
-                    val = data.get(name, "")
-                    itm = QTableWidgetItem(str(val))
-                    if c in CALCULATED_COLS:
-                        itm.setFlags(Qt.ItemIsEnabled)
-                        itm.setBackground(QColor(230, 240, 250))
-                    else:
-                        itm.setFlags(Qt.ItemIsEnabled | Qt.ItemIsEditable | Qt.ItemIsSelectable)
-                    self.table.setItem(r, c, itm)
+        self.model.set_rows([{}])
 
     def open_trade_editor(self, row):
-        cw = self.table.item(row, 0).text() if self.table.item(row, 0) else None
-        if not cw or self.current_etf not in self.trades_cache or cw not in self.trades_cache[self.current_etf]:
+        cw = self.model.column("CW")[row]
+        trades = self.trades_cache.get(self.current_etf)
+        if trades is not None:
+            trades = trades[trades["cw"] == cw]
+        if not cw or trades is None or trades.empty:
             QMessageBox.information(self, "Info", "No trades available for this week.")
             return
         
-        trades = self.trades_cache[self.current_etf][cw]
-        dialog = TradeEditorDialog(self, self.current_etf, cw, trades)
+        dialog = TradeEditorDialog(self, self.current_etf, cw, trades.to_dict("records"))
         if dialog.exec_() == QDialog.Accepted:
             self.alpaca_sync_all()
 
-    def on_cell_changed(self, item):
-        if self.block_signals:
-            return
-        if item.column() in EDITABLE_COLS:
-            self.recalculate_all()
-            self.save_state()
+    def on_cell_changed(self, top_left, bottom_right, roles=None):
+        if top_left.column() in EDITABLE_SET:
+            self._edit_timer.start()
 
     def on_data_changed(self):
-        if not self.block_signals:
-            self.recalculate_all()
-            self.save_state()
+        self._edit_timer.start()
 
-    def recalculate_all(self):
-        self.block_signals = True
+    def _flush_edits(self):
+        self._edit_timer.stop()
+        self.recalculate_all()
+        self.save_state()
+
+    @contextmanager
+    def bulk_update(self):
+        """Batch model changes; recalculation and saving run once when the outermost block exits."""
+        self._bulk_depth += 1
         try:
-            ini = float(self.invest_input.text().replace(",", "") or 0)
-        except ValueError:
-            ini = 0.0
-        
-        total_net_dividends = 0.0
+            yield
+        finally:
+            self._bulk_depth -= 1
+            if not self._bulk_depth:
+                self._do_recalculate_all()
+                self.save_state()
+
+    def recalculate_all(self):
+        if not self._bulk_depth:
+            self._recalc_timer.start()
+
+    def _do_recalculate_all(self):
+        self._recalc_timer.stop()
+        ini = self.invest_input.value()
         
-        for r in range(self.table.rowCount()):
-            try:
-                price = float(self.table.item(r, 8).text().replace(",", "").replace("$", "").strip() or 0)
-            except (AttributeError, ValueError):
-                price = 0.0
-            
-            try:
-                net_amount = float(self.table.item(r, 5).text().replace(",", "").replace("$", "").strip() or 0)
-            except (AttributeError, ValueError):
-                net_amount = 0.0
-            
-            drip = int(net_amount / price) if price and net_amount else 0
-            
-            try:
-                total_shares = int(self.table.item(r, 7).text().replace(",", "").strip() or 0)
-            except (AttributeError, ValueError):
-                total_shares = 0
-            
-            value = total_shares * price
-            total_net_dividends += net_amount
-            avg_week = total_net_dividends / (r + 1) if (r + 1) > 0 else 0
-            annual = avg_week * 52
-            total_return = total_net_dividends - ini
-            
-            self.table.item(r, 6).setText(str(drip))
-            self.table.item(r, 9).setText(f"${value:,.2f}")
-            self.table.item(r, 10).setText(f"${avg_week:,.2f}")
-            self.table.item(r, 11).setText(f"${annual:,.2f}")
-            
-            rend = self.table.item(r, 12)
-            rend.setText(f"${total_return:,.2f}")
-            rend.setForeground(QColor(0, 128, 0) if total_return >= 0 else QColor(255, 0, 0))
+        price, net_amount, total_shares, total_net_dividends = self.model.numeric_inputs()
+        has_price = price > 0
+        drip = np.where(has_price, np.trunc(net_amount / np.where(has_price, price, 1.0)), 0.0)
+        avg_week = total_net_dividends / np.arange(1, len(net_amount) + 1)
         
-        self.block_signals = False
+        self.model.set_derived({
+            "DRIP": drip,
+            "Value": total_shares * price,
+            "Ø/Week": avg_week,
+            "Year": avg_week * 52,
+            "Return": total_net_dividends - ini,
+        })
 
     def input_alpaca_api(self):
         cfg = load_alpaca_config()
@@ -529,278 +1242,68 @@ class DivTracker(QMainWindow):
             QMessageBox.information(self, "Saved", f"API data ({mode}) saved successfully")
 
     def alpaca_sync_all(self):
+        if self._sync_worker is not None:
+            # e.g. trades ignored in the editor meanwhile: sync again once this one is done
+            self._sync_again = True
+            return
         cfg = load_alpaca_config()
-        key, secret, mode = cfg.get("key"), cfg.get("secret"), cfg.get("mode", "live")
-        if not key or not secret:
+        if not cfg.get("key") or not cfg.get("secret"):
             QMessageBox.warning(self, "Error", "Please enter Alpaca API data first")
             return
+        if self._edit_timer.isActive():
+            self._flush_edits()
         
-        use_paper = mode == "paper"
-        today = datetime.today()
-        tomorrow = today + timedelta(days=1)
-        until = tomorrow.strftime("%Y-%m-%d")
-        current_year, current_week, _ = today.isocalendar()
-        current_cw = f"{current_week:02d}/{current_year}"
-
-        # Remember current ETF BEFORE sync
-        saved_etf = self.current_etf
-
-        try:
-            acts = get_all_activities_complete(key, secret, use_paper, after=None, until=until)
-            
-            positions = get_alpaca_positions(key, secret, use_paper)
-            print(f"✓ {len(positions)} positions fetched\n")
-
-            symbols_with_divs = set()
-            for a in acts:
-                if a.get("activity_type") in ["DIV", "DIVNRA"]:
-                    sym = a.get("symbol")
-                    if sym:
-                        symbols_with_divs.add(sym)
-            
-            print(f"✓ {len(symbols_with_divs)} symbols with dividends found\n")
-
-            for sym in list(self.states.keys()):
-                if sym not in symbols_with_divs:
-                    print(f"⊗ {sym}: No dividends -> will be removed")
-                    self.states.pop(sym, None)
-
-            for sym in symbols_with_divs:
-                if sym not in self.states:
-                    self.states[sym] = {"invest": 0.00, "rows": []}
-
-            grouped = defaultdict(lambda: defaultdict(lambda: {
-                "div_gross": 0.0,
-                "div_tax": 0.0,
-                "buy_total_cost": 0.0,
-                "buy_total_qty": 0.0,
-                "sell_total_cost": 0.0,
-                "sell_total_qty": 0.0,
-                "trades": []
-            }))
-            
-            ignored_trades = load_ignored_trades()
-            
-            # Track seen order_ids to prevent duplicates
-            seen_order_ids = set()
-
-            for a in acts:
-                sym = a.get("symbol")
-                if not sym or sym not in self.states:
-                    continue
-
-                typ = a.get("activity_type", "")
-                dstr = a.get("date") or a.get("transaction_time", "")[:10]
-                if not dstr:
-                    continue
-
-                dt = datetime.fromisoformat(dstr)
-                y, w, _ = dt.isocalendar()
-                cw = f"{w:02d}/{y}"
-
-                if typ == "FILL":
-                    side = a.get("side")
-                    trade_type = a.get("type", "").lower().strip()
-                    if trade_type not in ["fill", "partial_fill"]:
-                        continue
-
-                    order_id = a.get("id", f"{sym}_{cw}")
-
-                    if order_id in seen_order_ids:
-                        print(f"  [DUPLICATE] {order_id} - skipped")
-                        continue
-                    
-                    seen_order_ids.add(order_id)
-
-                    if ignored_trades.get(order_id, False):
-                        print(f"  [IGNORED] {order_id}")
-                        continue
-
-                    qty = float(a.get("qty", 0))
-                    if qty <= 0:
-                        continue
-
-                    price = float(a.get("price", 0))
-                    cost = qty * price
-
-                    if side == "buy":
-                        grouped[sym][cw]["buy_total_cost"] += cost
-                        grouped[sym][cw]["buy_total_qty"] += qty
-                        grouped[sym][cw]["trades"].append({
-                            "order_id": order_id,
-                            "qty": qty,
-                            "price": price
-                        })
-                    elif side == "sell":
-                        grouped[sym][cw]["sell_total_cost"] += cost
-                        grouped[sym][cw]["sell_total_qty"] += qty
-
-                    
-                elif typ == "DIV":
-                    gross_amt = float(a.get("net_amount", a.get("amount", 0)))
-                    grouped[sym][cw]["div_gross"] += gross_amt
-                    
-                elif typ == "DIVNRA":
-                    tax_amt = float(a.get("net_amount", a.get("amount", 0)))
-                    grouped[sym][cw]["div_tax"] += tax_amt
-
-            if self.current_etf not in self.trades_cache:
-                self.trades_cache[self.current_etf] = {}
-
-            for sym, weeks in grouped.items():
-                print(f"\n{'='*60}")
-                print(f"Processing {sym}: {len(weeks)} weeks")
-                print(f"{ '='*60}\n")
-                
-                rows = []
-                current_price = 0.0
-                
-                for pos in positions:
-                    if pos["symbol"] == sym:
-                        current_price = float(pos["current_price"])
-                        break
-                
-                if current_cw not in weeks:
-                    weeks[current_cw] = {
-                        "div_gross": 0.0,
-                        "div_tax": 0.0,
-                        "buy_total_cost": 0.0,
-                        "buy_total_qty": 0.0,
-                        "sell_total_cost": 0.0,
-                        "sell_total_qty": 0.0,
-                        "trades": []
-                    }
-                
-                sorted_weeks = sorted(weeks.keys(), 
-                                    key=lambda k: (int(k.split("/")[1]), int(k.split("/")[0])))
-                
-                # Load existing rows for Div/W protection
-                existing_rows = {r["CW"]: r for r in self.states.get(sym, {}).get("rows", [])}
-                
-                
-                print(f"Weeks: {', '.join(sorted_weeks)}")
-                print(f"Current week: {current_cw}\n")
-                
-                total_invested = 0.0
-                cumulative_shares = 0
-                cumulative_div_total = 0.0
-                week_count = 0
-                
-                for cw in sorted_weeks:
-                    vals = weeks[cw]
-                    row = {c: "" for c in COLUMNS}
-                    row["CW"] = cw
-                    
-                    if sym not in self.trades_cache:
-                        self.trades_cache[sym] = {}
-                    self.trades_cache[sym][cw] = vals["trades"]
-                    
-                    start_shares_this_week = cumulative_shares
-                    row["Start"] = str(start_shares_this_week)
-                    
-                    gross_div = vals["div_gross"]
-                    wht_div = abs(vals["div_tax"])
-                    net_div = gross_div - wht_div
-                    buy_cost = vals["buy_total_cost"]
-                    buy_qty = vals["buy_total_qty"]
-                    sell_cost = vals["sell_total_cost"]
-                    sell_qty = vals["sell_total_qty"]
-                    
-                    row["Gross"] = f"${gross_div:,.2f}"
-                    row["WHT"] = f"${wht_div:,.2f}"
-                    row["Net"] = f"${net_div:,.2f}"
-                    
-                    print(f"{cw}: DIV=${gross_div:.2f}, DIVNRA=${wht_div:.2f}, Net=${net_div:.2f}")
-                    
-                    # Div/W PROTECTION: Check if manually set
-                    if cw in existing_rows and existing_rows[cw].get("Div/W", "").strip():
-                        row["Div/W"] = existing_rows[cw]["Div/W"]
-                        print(f"{cw}: Div/W manually set -> keeping: {row['Div/W']}")
-                    else:
-                        if start_shares_this_week > 0:
-                            rate_per_week = gross_div / start_shares_this_week
-                            row["Div/W"] = f"{rate_per_week:.4f}"
-                            print(f"{cw}: Div/W = ${gross_div:.2f} / {start_shares_this_week} = {rate_per_week:.4f}")
-                        else:
-                            row["Div/W"] = ""
-                    
-                    if buy_qty > 0:
-                        cumulative_shares += int(buy_qty)
-                        avg_buy_price = buy_cost / buy_qty
-                        row["Price"] = f"{avg_buy_price:.2f}"
-                        print(f"{cw}: Buy +{int(buy_qty)} @ ${avg_buy_price:.2f} -> {cumulative_shares}")
-                        
-                        if net_div >= buy_cost:
-                            drip_shares = int(net_div / avg_buy_price)
-                            print(f"{cw}: DRIP detected! ${net_div:.2f} Div >= ${buy_cost:.2f} Buy")
-                            row["DRIP"] = str(drip_shares)
-                        else:
-                            net_investment = buy_cost - net_div
-                            total_invested += net_investment
-                            print(f"{cw}: Invest +${net_investment:.2f} (Buys: ${buy_cost:.2f}, Div: ${net_div:.2f})")
-                            row["DRIP"] = "0"
-                    else:
-                        if current_price > 0:
-                            row["Price"] = f"{current_price:.2f}"
-                        row["DRIP"] = "0"
-
-                    if sell_qty > 0:
-                        total_invested -= sell_cost
-                        cumulative_shares = 0
-                        print(f"{cw}: Sale of {int(sell_qty)} shares. Holdings set to 0.")
-                        print(f"{cw}: Investment reduced by ${sell_cost:.2f}.")
-                    
-                    row["Total"] = str(cumulative_shares)
-
-                    # Calculate value
-                    if current_price > 0:
-                        value = cumulative_shares * current_price
-                        row["Value"] = f"${value:,.2f}"
-                    else:
-                        row["Value"] = "$0.00"
-
-                    # Cumulative dividends
-                    cumulative_div_total += net_div
-                    week_count += 1
-
-                    # Ø/Week
-                    if week_count > 0:
-                        avg_per_week = cumulative_div_total / week_count
-                        row["Ø/Week"] = f"${avg_per_week:.2f}"
-                    else:
-                        row["Ø/Week"] = "$0.00"
-
-                    # Year (52 weeks projected)
-                    if week_count > 0:
-                        yearly = (cumulative_div_total / week_count) * 52
-                        row["Year"] = f"${yearly:,.2f}"
-                    else:
-                        row["Year"] = "$0.00"
-
-                    # Return
-                    rendite = cumulative_div_total - total_invested
-                    if rendite < 0:
-                        row["Return"] = f"$-{abs(rendite):,.2f}"
-                    else:
-                        row["Return"] = f"${rendite:,.2f}"
-
-                    row["Edit"] = "Edit"
-
-                    rows.append(row)
-                
-                print(f"\n✓ {len(rows)} rows, ${total_invested:.2f}, {cumulative_shares} Shares\n")
-                
-                self.states[sym]["invest"] = round(total_invested, 2)
-                self.states[sym]["rows"] = rows
+        worker = SyncWorker(cfg, self.states, self.trades_cache)
+        worker.signals.progress.connect(self._on_sync_progress)
+        worker.signals.finished.connect(self._on_sync_finished)
+        worker.signals.failed.connect(self._on_sync_failed)
+        self._sync_worker = worker
+        self._lock_for_sync(True)
+        self.status_label.setText("Status: Syncing with Alpaca...")
+        QThreadPool.globalInstance().start(worker)
+
+    def _on_sync_progress(self, done, total):
+        self.status_label.setText(f"Status: Syncing with Alpaca... {done}/{total} ETFs")
+
+    def _lock_for_sync(self, locked):
+        """The worker's result replaces self.states, so nothing may edit them meanwhile."""
+        for widget in (self.btn_sync, self.btn_add, self.btn_del, self.btn_week,
+                       self.btn_reset, self.invest_input):
+            widget.setEnabled(not locked)
+        self.model.set_read_only(locked)
+
+    def _end_sync(self, status):
+        self._sync_worker = None
+        self._lock_for_sync(False)
+        self.status_label.setText(status)
+        if self._close_after_sync:
+            QTimer.singleShot(0, self.close)
+            return False
+        return True
+
+    def _on_sync_failed(self, message, details):
+        self._sync_again = False
+        if not self._end_sync("Status: Sync failed"):
+            return
+        box = QMessageBox(QMessageBox.Critical, "Error", message, QMessageBox.Ok, self)
+        box.setDetailedText(details)
+        box.exec_()
 
-            save_sync_state({"last_activity_after": until})
-            save_all_states(self.states)
-            save_trades_cache(self.trades_cache)
-            
-            # AFTER SYNC: Restore ETF dropdown
-            self.etf_selector.blockSignals(True)
-            self.etf_selector.clear()
-            self.etf_selector.addItems(sorted(self.states.keys()))
+    def _on_sync_finished(self, result):
+        keep_open = self._end_sync("Status: Sync finished")
+        saved_etf = self.current_etf
+        self.states = result["states"]
+        self.trades_cache = result["trades_cache"]
+        self._flush_states()
+        
+        # AFTER SYNC: Restore ETF dropdown, touching only added/removed ETFs
+        names, known = set(self.states), set(self._etf_names)
+        with QSignalBlocker(self.etf_selector):
+            if names != known:
+                for name in known - names:
+                    self._remove_etf_item(name)
+                for name in sorted(names - known):
+                    self._insert_etf_item(name)
             
             # Try to select saved ETF
             if saved_etf in self.states:
@@ -812,56 +1315,52 @@ class DivTracker(QMainWindow):
                     first_etf = list(self.states.keys())[0]
                     self.etf_selector.setCurrentText(first_etf)
                     self.current_etf = first_etf
-            
-            self.etf_selector.blockSignals(False)
-            self.refresh_from_state()
-            
-            QMessageBox.information(self, "Sync successful", 
-                f"✓ {len(acts)} activities synchronized\n"
-                f"✓ {len(self.states)} ETFs updated")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"{str(e)}\n\n{traceback.format_exc()}")
+        
+        self.refresh_from_state()
+        if not keep_open:
+            return
+        if self._sync_again:
+            self._sync_again = False
+            self.alpaca_sync_all()
+            return
+        
+        QMessageBox.information(self, "Sync successful", 
+            f"✓ {result['new']} new activities ({result['total']} total) synchronized\n"
+            f"✓ {len(self.states)} ETFs updated")
 
     def add_week(self):
-        self.block_signals = True
-        r = self.table.rowCount()
-        self.table.insertRow(r)
-        for c in range(len(COLUMNS)):
-            if c == len(COLUMNS) - 1:
-                btn = QPushButton("Edit")
-                btn.clicked.connect(lambda checked, row=r: self.open_trade_editor(row))
-                self.table.setCellWidget(r, c, btn)
-            else:
-                itm = QTableWidgetItem("")
-                if c in CALCULATED_COLS:
-                    itm.setFlags(Qt.ItemIsEnabled)
-                    itm.setBackground(QColor(230, 240, 250))
-                else:
-                    itm.setFlags(Qt.ItemIsEnabled | Qt.ItemIsEditable | Qt.ItemIsSelectable)
-                self.table.setItem(r, c, itm)
-        self.block_signals = False
+        self.model.append_row()
         self.recalculate_all()
         self.save_state()
 
     def save_state(self):
-        try:
-            ini = float(self.invest_input.text().replace(",", "") or 0)
-        except ValueError:
-            ini = 0.0
-        rows = []
-        for r in range(self.table.rowCount()):
-            data = {}
-            for c, name in enumerate(COLUMNS[:-1]):
-                itm = self.table.item(r, c)
-                data[name] = itm.text() if itm else ""
-            rows.append(data)
+        if self._bulk_depth:
+            return  # bulk_update saves once on exit
+        if self._recalc_timer.isActive():  # snapshot must include pending recalculation
+            self._do_recalculate_all()
+        ini = self.invest_input.value()
+        rows = self.model.records()
+        prev = self.states.get(self.current_etf, {})
+        if prev.get("invest") == round(ini, 2) and prev.get("rows") == rows:
+            return
         self.states[self.current_etf] = {
             "invest": round(ini, 2),
             "rows": rows,
-            "last_modified": datetime.now().isoformat()
+            "last_modified_ns": time.time_ns()
         }
-        save_all_states(self.states)
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        self._flush_timer.start()
+
+    def _flush_states(self):
+        self._flush_timer.stop()
+        # Edits only stamp a raw timestamp; format it once per write
+        for st in self.states.values():
+            ns = st.pop("last_modified_ns", None)
+            if ns is not None:
+                st["last_modified"] = datetime.fromtimestamp(ns / 1e9).isoformat()
+        self._last_written_hash = save_all_states(self.states, self._last_written_hash)
 
     def export_csv(self):
         fname, _ = QFileDialog.getSaveFileName(
@@ -871,9 +1370,10 @@ class DivTracker(QMainWindow):
             "CSV Files (*.csv)"
         )
         if fname:
-            data = [[self.table.item(r, c).text() if self.table.item(r, c) else ""
-                     for c in range(len(COLUMNS)-1)] for r in range(self.table.rowCount())]
-            pd.DataFrame(data, columns=COLUMNS[:-1]).to_csv(fname, index=False, encoding="utf-8-sig")
+            with open(fname, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.DictWriter(f, fieldnames=DATA_COLUMNS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(self.model.records())
             QMessageBox.information(self, "Success", f"CSV exported:\n{fname}")
 
     def export_pdf(self):
@@ -890,22 +1390,9 @@ class DivTracker(QMainWindow):
         elems = [Paragraph(f"DIVTRACKER – {self.current_etf} – {datetime.now():%d.%m.%Y}",
                           styles["Title"])]
         elems.append(Spacer(1, 0.3*inch))
-        data = [COLUMNS[:-1]]
-        for r in range(self.table.rowCount()):
-            data.append([self.table.item(r, c).text() if self.table.item(r, c) else ""
-                        for c in range(len(COLUMNS)-1)])
-        widths = [1.2*cm,1.5*cm,2*cm,1.7*cm,1.2*cm,1.5*cm,1.3*cm,1.7*cm,
-                  1.8*cm,1.8*cm,1.2*cm,1.5*cm,2*cm]
-        tbl = Table(data, repeatRows=1, colWidths=widths)
-        tbl.setStyle(TableStyle([
-            ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#8FBC8F")),
-            ("TEXTCOLOR", (0,0), (-1,0), colors.whitesmoke),
-            ("ALIGN", (0,0), (-1,-1), "CENTER"),
-            ("FONTNAME", (0,0), (-1,0), "Helvetica-Bold"),
-            ("FONTSIZE", (0,0), (-1,-1), 8),
-            ("GRID", (0,0), (-1,-1), 0.5, colors.black),
-            ("ROWBACKGROUNDS", (0,1), (-1,-1), [colors.white, colors.HexColor("#D6E4F5")])
-        ]))
+        data = [PDF_HEADER] + [[rec[name] for name in DATA_COLUMNS] for rec in self.model.records()]
+        tbl = Table(data, repeatRows=1, colWidths=PDF_COL_WIDTHS)
+        tbl.setStyle(PDF_TABLE_STYLE)
         elems.append(tbl)
         doc.build(elems)
         QMessageBox.information(self, "Success", f"PDF exported:\n{fname}")
@@ -914,9 +1401,22 @@ class DivTracker(QMainWindow):
         if QMessageBox.question(self,"Reset",
             f"Really delete '{self.current_etf}'?",
             QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
-            self.invest_input.setText("0.00")
-            self.create_empty_row()
-            self.save_state()
+            with self.bulk_update():
+                self.invest_input.setValue(0.0)
+                self.create_empty_row()
+
+    def closeEvent(self, event):
+        if self._sync_worker is not None:
+            # The worker is still writing the caches; close once its result is in
+            self._close_after_sync = True
+            self.status_label.setText("Status: Closing after the running sync...")
+            event.ignore()
+            return
+        if self._edit_timer.isActive():
+            self._flush_edits()
+        self._flush_states()
+        save_last_viewed_etf(self.current_etf)
+        super().closeEvent(event)
 
     def show_portfolio_overview(self):
         """Display portfolio overview with total investment and returns"""
@@ -927,14 +1427,19 @@ class DivTracker(QMainWindow):
         for sym in self.states:
             total_investment += self.states[sym]["invest"]
             if self.states[sym]["rows"]:
+                last = self.states[sym]["rows"][-1]
                 try:
-                    # Get current market value from last row
-                    value_str = self.states[sym]["rows"][-1].get("Value", "$0.00").replace(",", "").replace("$", "")
-                    total_value += float(value_str)
+                    # Current market value and dividend return from last row;
+                    # states saved before the numeric copies existed are parsed
+                    value = last.get("_value_num")
+                    if value is None:
+                        value = _parse_money(last.get("Value", "$0.00"))
+                    total_value += value
                     
-                    # Get "Return" (return from dividends) from last row
-                    return_str = self.states[sym]["rows"][-1].get("Return", "$0.00").replace(",", "").replace("$", "")
-                    repayment_investment += float(return_str)
+                    ret = last.get("_return_num")
+                    if ret is None:
+                        ret = _parse_money(last.get("Return", "$0.00"))
+                    repayment_investment += ret
                 except Exception:
                     pass
         